@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Per-vector metadata, stored alongside the vectors as a memory-mapped record array
+ROW_DTYPE = np.dtype([
+    ('chunk_id', 'S40'),
+    ('video_id', 'S40'),
+    ('chunk_index', '<i4'),
+    ('start_ms', '<i8'),
+])
+
+# Assignment and scans work in blocks so memory stays bounded
+BLOCK_SIZE = 65536
+
+# Chunk ids are allocated before their transaction commits, so a lower id can
+# appear after a higher one was synced; each sync re-reads this many ids back
+CHUNK_ID_OVERLAP = 1000
+
+EMPTY_META = {'dim': None, 'model': None, 'nlist': 0, 'last_chunk_id': None}
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (by inner product) for each vector, block by block"""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), BLOCK_SIZE):
+        block = np.asarray(vectors[start:start + BLOCK_SIZE], dtype=np.float32)
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+def _kmeans(sample: np.ndarray, nlist: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """Spherical k-means over L2-normalized vectors"""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        counts = np.bincount(assignment, minlength=nlist)
+        
+        # Re-seed empty clusters from random sample points
+        empty = counts == 0
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+class ANNIndex:
+    """On-disk IVF index over transcript chunk embeddings.
+    
+    Vectors and per-vector metadata are append-only files opened as memory maps,
+    so only the inverted lists probed by a query are read. Until the index is
+    trained (or while it is small) queries fall back to a blocked exact scan.
+    One writer at a time; readers can run concurrently.
+    """
+    
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        (self.path / 'lists').mkdir(exist_ok=True)
+        self.meta_path = self.path / 'meta.json'
+        self.vectors_path = self.path / 'vectors.f32'
+        self.rows_path = self.path / 'rows.bin'
+        self.centroids_path = self.path / 'centroids.npy'
+        
+        self.meta = dict(EMPTY_META)
+        if self.meta_path.exists():
+            self.meta.update(json.loads(self.meta_path.read_text()))
+        self.centroids = np.load(self.centroids_path) if self.centroids_path.exists() else None
+    
+    def _save_meta(self):
+        tmp_path = self.meta_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.meta))
+        os.replace(tmp_path, self.meta_path)
+    
+    def __len__(self):
+        if not self.rows_path.exists():
+            return 0
+        return self.rows_path.stat().st_size // ROW_DTYPE.itemsize
+    
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+    
+    def _vectors(self) -> np.ndarray:
+        return np.memmap(self.vectors_path, dtype=np.float32, mode='r').reshape(-1, self.meta['dim'])
+    
+    def _rows(self) -> np.ndarray:
+        return np.memmap(self.rows_path, dtype=ROW_DTYPE, mode='r')
+    
+    def _list_path(self, cluster: int) -> Path:
+        return self.path / 'lists' / f'{cluster}.i64'
+    
+    def add(self, vectors: np.ndarray, rows: List[Dict], model: str):
+        """Append vectors with their metadata, assigning them to lists if trained"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.meta['dim'] is None:
+            self.meta.update(dim=int(vectors.shape[1]), model=model)
+        if vectors.shape[1] != self.meta['dim'] or model != self.meta['model']:
+            raise ValueError(f"index holds {self.meta['model']} ({self.meta['dim']}d), got {model} ({vectors.shape[1]}d)")
+        
+        first_row = len(self)
+        records = np.array([
+            (str(r['chunk_id']).encode(), str(r['video_id']).encode(), r['chunk_index'],
+             -1 if r.get('start_ms') is None else r['start_ms'])
+            for r in rows
+        ], dtype=ROW_DTYPE)
+        
+        # Vectors first: a crash between the two writes leaves an orphan vector
+        # past the row count, which is ignored and overwritten by the next add
+        with open(self.vectors_path, 'r+b' if self.vectors_path.exists() else 'wb') as f:
+            f.seek(first_row * self.meta['dim'] * 4)
+            f.write(vectors.tobytes())
+            f.truncate()
+        with open(self.rows_path, 'ab') as f:
+            f.write(records.tobytes())
+        
+        if self.trained:
+            ids = np.arange(first_row, first_row + len(vectors), dtype=np.int64)
+            assignment = _assign(vectors, self.centroids)
+            for cluster in np.unique(assignment):
+                with open(self._list_path(int(cluster)), 'ab') as f:
+                    f.write(ids[assignment == cluster].tobytes())
+        
+        # Late-committed rows can sort below the high-water mark; never move it back
+        newest = max(r['chunk_id'] for r in rows)
+        if self.meta['last_chunk_id'] is None or newest > self.meta['last_chunk_id']:
+            self.meta['last_chunk_id'] = newest
+        self._save_meta()
+    
+    def reset(self):
+        """Drop every vector, list and centroid"""
+        for path in [self.vectors_path, self.rows_path, self.centroids_path, *(self.path / 'lists').glob('*.i64')]:
+            path.unlink(missing_ok=True)
+        self.centroids = None
+        self.meta = dict(EMPTY_META)
+        self._save_meta()
+    
+    def indexed_chunk_ids(self, chunk_ids: Iterable) -> set:
+        """The subset of chunk_ids already in the index"""
+        count = len(self)
+        wanted = np.array([str(c).encode() for c in chunk_ids], dtype=ROW_DTYPE['chunk_id'])
+        if not count or not len(wanted):
+            return set()
+        column = self._rows()['chunk_id']
+        found = set()
+        for start in range(0, count, BLOCK_SIZE):
+            block = np.asarray(column[start:start + BLOCK_SIZE])
+            found.update(block[np.isin(block, wanted)].tolist())
+        return {c.decode() for c in found}
+    
+    def train(self, nlist: Optional[int] = None, sample_size: int = 100000):
+        """(Re)build centroids from a sample and reassign every vector to its list"""
+        count = len(self)
+        nlist = nlist or max(1, min(int(4 * np.sqrt(count)), count // 39))
+        vectors = self._vectors()[:count]
+        
+        rng = np.random.default_rng(0)
+        sample_ids = np.sort(rng.choice(count, min(sample_size, count), replace=False))
+        centroids = _kmeans(np.asarray(vectors[sample_ids]), nlist)
+        
+        for list_file in (self.path / 'lists').glob('*.i64'):
+            list_file.unlink()
+        for start in range(0, count, BLOCK_SIZE):
+            block = vectors[start:start + BLOCK_SIZE]
+            assignment = _assign(block, centroids)
+            ids = np.arange(start, start + len(block), dtype=np.int64)
+            for cluster in np.unique(assignment):
+                with open(self._list_path(int(cluster)), 'ab') as f:
+                    f.write(ids[assignment == cluster].tobytes())
+        
+        np.save(self.centroids_path, centroids)
+        self.centroids = centroids
+        self.meta['nlist'] = nlist
+        self._save_meta()
+        logger.info(f'Trained {nlist} lists over {count} vectors')
+    
+    def _candidates(self, query: np.ndarray, nprobe: int) -> Optional[np.ndarray]:
+        if not self.trained:
+            return None
+        lists = np.argsort(-(self.centroids @ query))[:nprobe]
+        parts = [np.fromfile(self._list_path(int(c)), dtype=np.int64)
+                 for c in lists if self._list_path(int(c)).exists()]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+    
+    def search_chunks(self, query: np.ndarray, k: int, nprobe: int = 8) -> List[Dict]:
+        """Top-k chunks by inner product with a normalized query vector"""
+        count = len(self)
+        if not count:
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        vectors = self._vectors()
+        
+        ids = self._candidates(query, nprobe)
+        if ids is None:
+            # Exact blocked scan
+            scores = np.concatenate([
+                np.asarray(vectors[start:min(start + BLOCK_SIZE, count)]) @ query
+                for start in range(0, count, BLOCK_SIZE)
+            ])
+            ids = np.arange(count)
+        else:
+            ids = ids[ids < count]
+            scores = np.asarray(vectors[ids]) @ query if len(ids) else np.empty(0, dtype=np.float32)
+        
+        top = np.argsort(-scores)[:k]
+        rows = self._rows()
+        return [{
+            'chunk_id': rows[ids[i]]['chunk_id'].decode(),
+            'video_id': rows[ids[i]]['video_id'].decode(),
+            'chunk_index': int(rows[ids[i]]['chunk_index']),
+            'start_ms': int(rows[ids[i]]['start_ms']) if rows[ids[i]]['start_ms'] >= 0 else None,
+            'score': float(scores[i])
+        } for i in top]
+    
+    def search(self, query: np.ndarray, k: int = 10, nprobe: int = 8) -> List[Dict]:
+        """Top-k videos, each with its best-matching chunk's timestamp"""
+        best = {}
+        for hit in self.search_chunks(query, k * 10, nprobe):
+            if hit['video_id'] not in best:
+                best[hit['video_id']] = hit
+            if len(best) == k:
+                break
+        return list(best.values())
+    
+    def sync(self, model: str, batch_size: int = 5000) -> int:
+        """Pull this model's transcript_chunks added since the last sync; returns vectors added"""
+        from supabase_client import iter_rows
+        
+        if self.meta['model'] not in (None, model):
+            logger.info(f"Index holds {self.meta['model']} vectors; rebuilding for {model}")
+            self.reset()
+        
+        last_id = self.meta['last_chunk_id']
+        since = max(int(last_id) - CHUNK_ID_OVERLAP, 0) if last_id is not None else None
+        
+        def filters(query):
+            query = query.eq('model', model)
+            return query.gt('id', since) if since is not None else query
+        
+        chunks = iter_rows(
+            'transcript_chunks', 'id, video_id, chunk_index, start_ms, embedding',
+            filters=filters, page_size=batch_size
+        )
+        added = 0
+        for batch in _batches(chunks, batch_size):
+            # Skip rows from the overlap that an earlier sync already indexed
+            indexed = self.indexed_chunk_ids(c['id'] for c in batch if c['id'] <= last_id) if last_id is not None else set()
+            batch = [c for c in batch if str(c['id']) not in indexed]
+            if not batch:
+                continue
+            vectors = np.array([json.loads(c['embedding']) if isinstance(c['embedding'], str) else c['embedding']
+                                for c in batch], dtype=np.float32)
+            self.add(vectors, [dict(c, chunk_id=c['id']) for c in batch], model)
+            added += len(batch)
+        return added
+
+def _batches(items: Iterable, size: int) -> Iterable[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def format_timestamp(ms: Optional[int]) -> str:
+    if ms is None:
+        return '--:--:--'
+    seconds = ms // 1000
+    return f'{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}'
+
+def main():
+    parser = argparse.ArgumentParser(description='Local ANN index over transcript chunk embeddings')
+    parser.add_argument('--index', default=os.getenv('ANN_INDEX_DIR', 'ann_index'))
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    sync = subparsers.add_parser('sync', help='add new chunks from transcript_chunks')
+    sync.add_argument('--retrain', action='store_true', help='rebuild the inverted lists after syncing')
+    sync.add_argument('--nlist', type=int)
+    
+    query = subparsers.add_parser('query', help='search for videos matching a text query')
+    query.add_argument('text')
+    query.add_argument('-k', type=int, default=10)
+    query.add_argument('--nprobe', type=int, default=int(os.getenv('ANN_NPROBE', '8')))
+    
+    args = parser.parse_args()
+    
+    from embeddings import load_embedding_model
+    model_spec = os.getenv('EMBEDDING_MODEL', '')
+    if not model_spec:
+        sys.exit('Set EMBEDDING_MODEL to the model used for transcript_chunks')
+    index = ANNIndex(args.index)
+    
+    if args.command == 'sync':
+        model_name = load_embedding_model(model_spec).name
+        added = index.sync(model_name)
+        # Train once there is enough data for lists to beat an exact scan
+        min_train = int(os.getenv('ANN_MIN_TRAIN', '10000'))
+        if args.retrain or (not index.trained and len(index) >= min_train):
+            index.train(args.nlist)
+        logger.info(f'Added {added} vectors; index holds {len(index)}')
+        return
+    
+    model = load_embedding_model(model_spec)
+    start = time.perf_counter()
+    vector = model.embed([args.text])[0]
+    embed_ms = (time.perf_counter() - start) * 1000
+    
+    start = time.perf_counter()
+    results = index.search(vector, args.k, args.nprobe)
+    search_ms = (time.perf_counter() - start) * 1000
+    
+    for rank, hit in enumerate(results, 1):
+        print(f"{rank:>2}. video {hit['video_id']}  at {format_timestamp(hit['start_ms'])} "
+              f"({hit['start_ms']} ms)  score {hit['score']:.3f}")
+    print(f'{len(results)} videos from {len(index)} chunks; embed {embed_ms:.1f} ms, search {search_ms:.1f} ms')
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=getattr(logging, os.getenv('LOG_LEVEL', 'INFO')),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+import re
+from typing import Dict, Iterator, List, Tuple
+
+# Sentence ends, or line breaks for transcripts without punctuation
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n+')
+WORD = re.compile(r'\S+')
+
+# Rough English average; good enough for budgeting without a tokenizer dependency
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a piece of text"""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+def sentence_spans(text: str) -> Iterator[Tuple[int, int]]:
+    """Yield (start, end) character offsets of each sentence"""
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        if match.start() > start:
+            yield start, match.start()
+        start = match.end()
+    if start < len(text):
+        yield start, len(text)
+
+def _split_long_span(text: str, start: int, end: int, max_chars: int) -> Iterator[Tuple[int, int]]:
+    """Split an oversized sentence on word boundaries"""
+    chunk_start = chunk_end = None
+    for match in WORD.finditer(text, start, end):
+        if chunk_start is not None and match.end() - chunk_start > max_chars:
+            yield chunk_start, chunk_end
+            chunk_start = None
+        if chunk_start is None:
+            chunk_start = match.start()
+        chunk_end = match.end()
+    if chunk_start is not None:
+        yield chunk_start, chunk_end
+
+def chunk_text(text: str, max_tokens: int) -> List[Dict]:
+    """Split text on sentence boundaries into chunks of at most max_tokens.
+    
+    Returns dicts with the chunk 'text' and its 'start'/'end' character offsets.
+    """
+    spans = []
+    chunk_start = chunk_end = None
+    chunk_tokens = 0
+    
+    for start, end in sentence_spans(text):
+        tokens = estimate_tokens(text[start:end])
+        
+        if tokens > max_tokens:
+            if chunk_start is not None:
+                spans.append((chunk_start, chunk_end))
+                chunk_start, chunk_tokens = None, 0
+            spans.extend(_split_long_span(text, start, end, max_tokens * CHARS_PER_TOKEN))
+            continue
+        
+        if chunk_start is not None and chunk_tokens + tokens > max_tokens:
+            spans.append((chunk_start, chunk_end))
+            chunk_start, chunk_tokens = None, 0
+        if chunk_start is None:
+            chunk_start = start
+        chunk_end = end
+        chunk_tokens += tokens
+    
+    if chunk_start is not None:
+        spans.append((chunk_start, chunk_end))
+    
+    return [{'text': text[start:end], 'start': start, 'end': end} for start, end in spans]
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+import os
+import re
+import sys
+import hashlib
+import logging
+import argparse
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+from chunking import chunk_text
+from supabase_client import get_supabase_client, iter_rows
+from transcript_codec import TranscriptCodec
+from video_catalog import VideoCatalog
+from write_buffer import FLUSH_TIME, get_write_buffer
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TOKEN = re.compile(r'\w+')
+
+class EmbeddingModel(ABC):
+    """Interface for local embedding models: L2-normalized float32 vectors"""
+    name = 'base'
+    dim = 0
+    
+    @abstractmethod
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts as an (n, dim) array"""
+
+class HashingEmbeddingModel(EmbeddingModel):
+    """Deterministic feature-hashing embeddings; a dependency-free stand-in for tests"""
+    
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.name = f'hashing-{dim}'
+    
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in TOKEN.findall(text.lower()):
+                h = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+                vectors[row, h % self.dim] += 1.0 if h >> 63 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+class SentenceTransformerModel(EmbeddingModel):
+    """sentence-transformers model run locally on CPU"""
+    
+    def __init__(self, model_name: str, batch_size: int):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise RuntimeError(f'sentence-transformers is required for EMBEDDING_MODEL={model_name}')
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.batch_size = batch_size
+        self.name = model_name
+        self.dim = self.model.get_sentence_embedding_dimension()
+    
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
+            texts, batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+        ).astype(np.float32)
+
+def load_embedding_model(spec: str, batch_size: int = 64) -> EmbeddingModel:
+    """Build a model from a spec: 'hashing', 'hashing:<dim>', or a sentence-transformers name"""
+    if spec == 'hashing' or spec.startswith('hashing:'):
+        return HashingEmbeddingModel(int(spec.split(':', 1)[1]) if ':' in spec else 384)
+    return SentenceTransformerModel(spec, batch_size)
+
+def format_vector(vector: np.ndarray) -> str:
+    """pgvector text input"""
+    return '[' + ','.join(f'{x:.6f}' for x in vector) + ']'
+
+class EmbeddingStage:
+    """Chunks transcripts, embeds chunks in batches and upserts them into transcript_chunks.
+    
+    Work is resumable at two levels: chunks already stored for a transcript are
+    skipped, and transcripts.embedded_at marks transcripts that are complete so
+    backfill() can pick up anything interrupted.
+    """
+    
+    def __init__(self, model: EmbeddingModel, chunk_tokens: int, batch_size: int):
+        self.model = model
+        self.chunk_tokens = chunk_tokens
+        self.batch_size = batch_size
+        self.supabase = get_supabase_client()
+        self.write_buffer = get_write_buffer()
+    
+    @classmethod
+    def from_env(cls) -> Optional['EmbeddingStage']:
+        spec = os.getenv('EMBEDDING_MODEL', '')
+        if not spec:
+            return None
+        batch_size = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))
+        return cls(
+            load_embedding_model(spec, batch_size),
+            chunk_tokens=int(os.getenv('EMBEDDING_CHUNK_TOKENS', '256')),
+            batch_size=batch_size
+        )
+    
+    def _stored_chunk_indexes(self, transcript_id) -> set:
+        """Chunk indexes already embedded with this model; other models' chunks are deleted
+        
+        Re-embedded chunks are then inserted rather than upserted in place, so they
+        get new ids and ann_index's incremental sync, which pages by id, sees them.
+        """
+        stored, stale = set(), False
+        for row in iter_rows('transcript_chunks', 'id, chunk_index, model',
+                             filters=lambda query: query.eq('transcript_id', transcript_id)):
+            if row['model'] == self.model.name:
+                stored.add(row['chunk_index'])
+            else:
+                stale = True
+        
+        if stale:
+            self.supabase.table('transcript_chunks').delete().eq(
+                'transcript_id', transcript_id
+            ).neq('model', self.model.name).execute()
+        return stored
+    
+    def embed_transcript(self, transcript_id, video: Dict, text: str) -> int:
+        """Embed and store the missing chunks of one transcript; returns chunks written"""
+        chunks = chunk_text(text, self.chunk_tokens)
+        stored = self._stored_chunk_indexes(transcript_id)
+        todo = [(index, chunk) for index, chunk in enumerate(chunks) if index not in stored]
+        
+        # Timestamps are estimated from character position and video duration
+        duration_ms = (video.get('duration') or 0) * 1000
+        
+        for i in range(0, len(todo), self.batch_size):
+            batch = todo[i:i + self.batch_size]
+            vectors = self.model.embed([chunk['text'] for _, chunk in batch])
+            rows = [{
+                'transcript_id': transcript_id,
+                'video_id': video['id'],
+                'chunk_index': index,
+                'content': chunk['text'],
+                'start_char': chunk['start'],
+                'start_ms': int(chunk['start'] / len(text) * duration_ms) if duration_ms else None,
+                'model': self.model.name,
+                'embedding': format_vector(vector)
+            } for (index, chunk), vector in zip(batch, vectors)]
+            
+            # Upsert synchronously so a crash never loses a batch that was counted as stored
+            self.supabase.table('transcript_chunks').upsert(
+                rows, on_conflict='transcript_id,chunk_index'
+            ).execute()
+        
+        self.write_buffer.update('transcripts', {'embedded_at': FLUSH_TIME}, 'id', transcript_id)
+        logger.info(f'Embedded transcript {transcript_id}: {len(todo)} new of {len(chunks)} chunks')
+        return len(todo)
+    
+    def backfill(self, codec: TranscriptCodec, video_lookup) -> int:
+        """Embed every transcript not yet marked embedded_at; returns transcripts processed"""
+        done = 0
+        pending = iter_rows(
+            'transcripts', 'id, video_id, transcript_format, raw_transcript, transcript_compressed',
+            filters=lambda query: query.is_('embedded_at', 'null'), page_size=50
+        )
+        for row in pending:
+            try:
+                video = video_lookup(row['video_id']) or {'id': row['video_id']}
+                self.embed_transcript(row['id'], video, codec.load_text(row))
+                done += 1
+            except Exception as e:
+                logger.error(f"Error embedding transcript {row['id']}: {e}")
+        return done
+
+def main():
+    parser = argparse.ArgumentParser(description='Embed transcripts that have no embeddings yet')
+    parser.add_argument('command', choices=['backfill'])
+    parser.parse_args()
+    
+    stage = EmbeddingStage.from_env()
+    if stage is None:
+        sys.exit('Set EMBEDDING_MODEL to enable embeddings')
+    
+    catalog = VideoCatalog(float(os.getenv('VIDEO_CATALOG_REFRESH_SECONDS', '300')))
+    done = stage.backfill(TranscriptCodec.from_env(), catalog.get)
+    get_write_buffer().close()
+    logger.info(f'Backfilled embeddings for {done} transcripts')
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=getattr(logging, os.getenv('LOG_LEVEL', 'INFO')),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    main()
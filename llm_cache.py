@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class LLMCache:
+    """Persistent, size-bounded LRU cache of LLM responses backed by SQLite"""
+    
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                tokens_used INTEGER,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)')
+        self._conn.commit()
+        self._total_bytes = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+    
+    @staticmethod
+    def make_key(model: str, prompt_template: str, transcript: str, params: Dict) -> str:
+        """Content address for a request: hash of model, template, input text and parameters"""
+        payload = json.dumps([model, prompt_template, transcript, params], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """Return a cached response and mark it as recently used"""
+        with self._lock:
+            row = self._conn.execute('SELECT content, tokens_used FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return {'content': row[0], 'tokens_used': row[1]}
+    
+    def put(self, key: str, content: str, tokens_used: Optional[int] = None):
+        """Store a response, evicting least recently used entries over the size bound"""
+        size = len(content.encode('utf-8'))
+        with self._lock:
+            old = self._conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, content, tokens_used, size, last_access) VALUES (?, ?, ?, ?, ?)',
+                (key, content, tokens_used, size, time.time())
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+    
+    def _evict(self):
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute('SELECT key, size FROM responses ORDER BY last_access LIMIT 100').fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._total_bytes -= size
+                self.evictions += 1
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'bytes': self._total_bytes
+            }
+    
+    def summary(self) -> str:
+        stats = self.stats()
+        return (f"{stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1%}), "
+                f"{stats['evictions']} evictions, {stats['bytes'] / 1e6:.1f} MB")
@@ -7,6 +7,7 @@ import time
 import threading
 from youtube_downloader import YouTubeDownloader
 from transcript_processor import TranscriptProcessor
+from supabase_client import connection_stats
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -26,6 +27,8 @@ def run_downloader():
         downloader.run()
     except Exception as e:
         logger.error(f'Error in scheduled download: {e}')
+    finally:
+        logger.info(f'Supabase connection reuse: {connection_stats.summary()}')
 
 def run_transcript_processor():
     """Run the transcript processor in a separate thread"""
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+import os
+import logging
+import threading
+from typing import Callable, Dict, Iterator, Optional
+import httpx
+from supabase import create_client, Client
+
+logger = logging.getLogger(__name__)
+
+class ConnectionStats:
+    """Counts HTTP requests against newly opened connections"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+    
+    def on_request(self, request: httpx.Request):
+        with self._lock:
+            self.requests += 1
+        # httpcore reports connection lifecycle events through the trace extension
+        request.extensions['trace'] = self._trace
+    
+    def _trace(self, event_name: str, info: dict):
+        if event_name == 'connection.connect_tcp.complete':
+            with self._lock:
+                self.connections += 1
+    
+    @property
+    def reuse_ratio(self) -> float:
+        """Fraction of requests served on an already-open connection"""
+        with self._lock:
+            if not self.requests:
+                return 0.0
+            return max(0.0, 1 - self.connections / self.requests)
+    
+    def summary(self) -> str:
+        return f'{self.requests} requests over {self.connections} connections ({self.reuse_ratio:.1%} reused)'
+
+connection_stats = ConnectionStats()
+
+_client: Optional[Client] = None
+_client_lock = threading.Lock()
+
+def _pooled_session(session: httpx.Client) -> httpx.Client:
+    """Rebuild a PostgREST session with explicit keep-alive pool limits"""
+    max_connections = int(os.getenv('SUPABASE_POOL_SIZE', '20'))
+    return httpx.Client(
+        base_url=session.base_url,
+        headers=session.headers,
+        timeout=session.timeout,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=float(os.getenv('SUPABASE_KEEPALIVE_SECONDS', '60'))
+        ),
+        event_hooks={'request': [connection_stats.on_request]}
+    )
+
+def get_supabase_client() -> Client:
+    """Return the process-wide Supabase client, creating it on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            client = create_client(
+                os.getenv('SUPABASE_URL'),
+                os.getenv('SUPABASE_KEY')
+            )
+            postgrest = client.postgrest
+            default_session = postgrest.session
+            postgrest.session = _pooled_session(default_session)
+            default_session.close()
+            _client = client
+            logger.info('Created shared Supabase client')
+        return _client
+
+def iter_rows(table: str, columns: str = '*', key: str = 'id', page_size: int = 1000,
+              filters: Optional[Callable] = None) -> Iterator[Dict]:
+    """Stream a table scan in keyset-paginated pages ordered by a unique key column.
+    
+    `columns` must include `key`. `filters` receives the select builder and
+    returns it with any extra filters applied, e.g. lambda q: q.eq('is_active', True).
+    """
+    client = get_supabase_client()
+    last_key = None
+    while True:
+        query = client.table(table).select(columns)
+        if filters:
+            query = filters(query)
+        if last_key is not None:
+            query = query.gt(key, last_key)
+        
+        # Stop on an empty page rather than a short one, since PostgREST may
+        # cap responses below page_size
+        rows = query.order(key).limit(page_size).execute().data
+        if not rows:
+            break
+        yield from rows
+        last_key = rows[-1][key]
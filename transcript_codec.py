@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import re
+import codecs
+import base64
+import hashlib
+import logging
+import threading
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import zstandard as zstd
+except ImportError:  # optional: only needed when compression is enabled
+    zstd = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSED_FORMAT = 'txt+zstd'
+
+WORD = re.compile(r'\S+')
+
+def read_transcript(path: str, chunk_size: int = 1 << 16) -> Dict:
+    """Read a transcript in one buffered pass.
+    
+    Returns the normalized text (no BOM, LF line endings, no NUL characters,
+    which Postgres text columns reject), its word count, and the SHA-256 of
+    the file's bytes. Words are counted per chunk so no word list is built.
+    """
+    digest = hashlib.sha256()
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    pieces = []
+    word_count = 0
+    in_word = False
+    pending_cr = False
+    
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            final = not chunk
+            digest.update(chunk)
+            text = decoder.decode(chunk, final=final)
+            
+            # A CRLF pair may straddle two chunks
+            if pending_cr:
+                text = '\r' + text
+            pending_cr = text.endswith('\r') and not final
+            if pending_cr:
+                text = text[:-1]
+            text = text.replace('\r\n', '\n').replace('\r', '\n').replace('\x00', '')
+            
+            if text:
+                matches = WORD.findall(text)
+                word_count += len(matches)
+                # A word split across the chunk boundary was counted twice
+                if matches and in_word and not text[0].isspace():
+                    word_count -= 1
+                in_word = not text[-1].isspace()
+                pieces.append(text)
+            
+            if final:
+                break
+    
+    return {'text': ''.join(pieces), 'word_count': word_count, 'content_hash': digest.hexdigest()}
+
+def train_dictionary(samples: List[str], dict_size: int = 112640) -> bytes:
+    """Train a shared zstd dictionary from sample transcripts"""
+    if zstd is None:
+        raise RuntimeError('zstandard is not installed')
+    return zstd.train_dictionary(dict_size, [s.encode('utf-8') for s in samples]).as_bytes()
+
+class TranscriptCodec:
+    """Optional zstd compression of transcript text for storage.
+    
+    Compressed transcripts are stored base64-encoded in transcripts.transcript_compressed
+    with transcript_format 'txt+zstd' and raw_transcript left null. A trained
+    dictionary helps a lot on short transcripts, which share most of their vocabulary.
+    """
+    
+    def __init__(self, method: str = 'none', dict_path: Optional[str] = None, level: int = 10):
+        self.method = method
+        self.level = level
+        self._dict = None
+        self._local = threading.local()
+        
+        if method == 'zstd' and zstd is None:
+            logger.warning('TRANSCRIPT_COMPRESSION=zstd but zstandard is not installed; storing plain text')
+            self.method = 'none'
+        if self.method == 'zstd' and dict_path:
+            self._dict = zstd.ZstdCompressionDict(Path(dict_path).read_bytes())
+            # Digest the dictionary once instead of on every compressor
+            self._dict.precompute_compress(level=self.level)
+    
+    @classmethod
+    def from_env(cls) -> 'TranscriptCodec':
+        return cls(
+            method=os.getenv('TRANSCRIPT_COMPRESSION', 'none').lower(),
+            dict_path=os.getenv('TRANSCRIPT_ZSTD_DICT') or None,
+            level=int(os.getenv('TRANSCRIPT_ZSTD_LEVEL', '10'))
+        )
+    
+    @property
+    def enabled(self) -> bool:
+        return self.method == 'zstd'
+    
+    def _contexts(self):
+        """This thread's (compressor, decompressor); zstd contexts aren't thread-safe"""
+        contexts = getattr(self._local, 'contexts', None)
+        if contexts is None:
+            contexts = self._local.contexts = (
+                zstd.ZstdCompressor(level=self.level, dict_data=self._dict),
+                zstd.ZstdDecompressor(dict_data=self._dict)
+            )
+        return contexts
+    
+    def compress(self, text: str) -> bytes:
+        return self._contexts()[0].compress(text.encode('utf-8'))
+    
+    def decompress(self, data: bytes) -> str:
+        return self._contexts()[1].decompress(data).decode('utf-8')
+    
+    def storage_fields(self, text: str) -> Dict:
+        """Columns to write for a transcript's text"""
+        if not self.enabled:
+            return {'raw_transcript': text, 'transcript_format': 'txt'}
+        return {
+            'raw_transcript': None,
+            'transcript_compressed': base64.b64encode(self.compress(text)).decode('ascii'),
+            'transcript_format': COMPRESSED_FORMAT
+        }
+    
+    def load_text(self, row: Dict) -> str:
+        """Return a transcript row's text, decompressing transparently"""
+        if row.get('transcript_format') == COMPRESSED_FORMAT and row.get('transcript_compressed'):
+            if zstd is None:
+                raise RuntimeError('zstandard is required to read compressed transcripts')
+            return self.decompress(base64.b64decode(row['transcript_compressed']))
+        return row.get('raw_transcript') or ''
+
+def _benchmark(name: str, texts: List[str], encode, decode):
+    start = time.perf_counter()
+    encoded = [encode(text) for text in texts]
+    write_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for data in encoded:
+        decode(data)
+    read_seconds = time.perf_counter() - start
+    
+    raw_mb = sum(len(t.encode('utf-8')) for t in texts) / 1e6
+    stored_mb = sum(len(d) for d in encoded) / 1e6
+    print(f'{name:<14} {stored_mb:>10.2f} MB  {raw_mb / stored_mb:>6.2f}x  '
+          f'write {raw_mb / write_seconds:>8.1f} MB/s  read {raw_mb / read_seconds:>8.1f} MB/s')
+
+def main():
+    parser = argparse.ArgumentParser(description='Train a zstd dictionary or benchmark transcript storage formats')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    train = subparsers.add_parser('train', help='train a dictionary from transcript files')
+    train.add_argument('folder')
+    train.add_argument('output')
+    train.add_argument('--size', type=int, default=112640)
+    
+    bench = subparsers.add_parser('bench', help='compare plain and compressed storage')
+    bench.add_argument('folder')
+    bench.add_argument('--dict', dest='dict_path')
+    bench.add_argument('--level', type=int, default=10)
+    bench.add_argument('--limit', type=int, default=2000)
+    
+    args = parser.parse_args()
+    if zstd is None:
+        sys.exit('zstandard is not installed (pip install zstandard)')
+    
+    files = sorted(Path(args.folder).rglob('*_transcript.txt'))
+    texts = [f.read_text(encoding='utf-8') for f in files[:getattr(args, 'limit', None) or len(files)]]
+    if not texts:
+        sys.exit(f'No transcripts found in {args.folder}')
+    
+    if args.command == 'train':
+        Path(args.output).write_bytes(train_dictionary(texts, args.size))
+        print(f'Wrote {args.size}-byte dictionary trained on {len(texts)} transcripts to {args.output}')
+        return
+    
+    # Stored sizes include base64, since that is what goes over the wire
+    print(f'{len(texts)} transcripts')
+    _benchmark('plain', texts, lambda t: t.encode('utf-8'), lambda d: d.decode('utf-8'))
+    codec = TranscriptCodec('zstd', level=args.level)
+    _benchmark('zstd', texts, lambda t: base64.b64encode(codec.compress(t)),
+               lambda d: codec.decompress(base64.b64decode(d)))
+    if args.dict_path:
+        dict_codec = TranscriptCodec('zstd', dict_path=args.dict_path, level=args.level)
+        _benchmark('zstd+dict', texts, lambda t: base64.b64encode(dict_codec.compress(t)),
+                   lambda d: dict_codec.decompress(base64.b64decode(d)))
+
+if __name__ == '__main__':
+    main()
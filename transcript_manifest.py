@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's bytes, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class TranscriptManifest:
+    """Local SQLite record of transcript files and how far each got.
+    
+    Statuses: queued, processed (transcript stored), unmatched (no video found),
+    failed. Only processed files are skipped by the startup scan.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT,
+                status TEXT NOT NULL,
+                video_id TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+    
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM files LIMIT 1').fetchone() is None
+    
+    def get(self, path: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT size, mtime_ns, content_hash, status, video_id FROM files WHERE path = ?', (path,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('size', 'mtime_ns', 'content_hash', 'status', 'video_id'), row))
+    
+    def record(self, path: str, status: str, video_id: Optional[str] = None,
+               content_hash: Optional[str] = None, stat: Optional[os.stat_result] = None):
+        """Store a file's current size, mtime and hash with its processing status"""
+        try:
+            stat = stat or os.stat(path)
+            content_hash = content_hash or file_digest(path)
+        except FileNotFoundError:
+            return
+        
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash, status, video_id, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (path, stat.st_size, stat.st_mtime_ns, content_hash, status,
+                 str(video_id) if video_id is not None else None, time.time())
+            )
+            self._conn.commit()
+    
+    def is_processed(self, path: str, stat: os.stat_result) -> bool:
+        """True if the file was processed and hasn't changed since.
+        
+        A size/mtime change alone (e.g. a touch) is confirmed against the hash.
+        """
+        entry = self.get(path)
+        if not entry or entry['status'] != 'processed':
+            return False
+        if (entry['size'], entry['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+            return True
+        
+        content_hash = file_digest(path)
+        if content_hash != entry['content_hash']:
+            return False
+        self.record(path, 'processed', entry['video_id'], content_hash, stat)
+        return True
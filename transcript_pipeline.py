@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+import os
+import queue
+import logging
+import threading
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of input for one worker
+_STOP = object()
+
+class TranscriptPipeline:
+    """Ingest -> DB write -> embed -> AI stages joined by bounded queues.
+    
+    Each stage has its own worker count. A full queue blocks the stage that
+    feeds it, so a slow AI stage pushes back on ingestion instead of letting
+    work pile up in memory.
+    """
+    
+    def __init__(self, processor, on_error: Optional[Callable] = None):
+        self.processor = processor
+        self.on_error = on_error
+        queue_size = int(os.getenv('PIPELINE_QUEUE_SIZE', '20'))
+        
+        self.stages = [
+            ('ingest', processor.ingest_transcript, int(os.getenv('INGEST_WORKERS', '2'))),
+            ('db', processor.save_transcript, int(os.getenv('DB_WORKERS', '2'))),
+            ('embed', processor.embed_transcript, int(os.getenv('EMBED_WORKERS', '1'))),
+            ('ai', processor.enrich_transcript, int(os.getenv('AI_WORKERS', '2'))),
+        ]
+        self.queues: List[queue.Queue] = [queue.Queue(maxsize=queue_size) for _ in self.stages]
+        self.workers: List[List[threading.Thread]] = []
+    
+    def submit(self, transcript_path: str):
+        """Queue a transcript file for processing, blocking while the pipeline is full"""
+        self.queues[0].put(transcript_path)
+    
+    def start(self):
+        for index, (name, handler, count) in enumerate(self.stages):
+            threads = [
+                threading.Thread(target=self._work, args=(index, handler),
+                                 name=f'pipeline-{name}-{n}', daemon=True)
+                for n in range(max(1, count))
+            ]
+            for thread in threads:
+                thread.start()
+            self.workers.append(threads)
+        logger.info('Transcript pipeline started: ' + ', '.join(
+            f'{name}={max(1, count)}' for name, _, count in self.stages
+        ))
+    
+    def stop(self):
+        """Drain every stage in order, then stop its workers"""
+        for index, threads in enumerate(self.workers):
+            for _ in threads:
+                self.queues[index].put(_STOP)
+            for thread in threads:
+                thread.join()
+        self.workers = []
+    
+    def _work(self, index: int, handler: Callable):
+        name = self.stages[index][0]
+        inbox = self.queues[index]
+        outbox = self.queues[index + 1] if index + 1 < len(self.queues) else None
+        
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                break
+            
+            try:
+                result = handler(item)
+            except Exception as e:
+                label = item if isinstance(item, str) else item.get('path')
+                logger.error(f'Error in {name} stage for {label}: {e}')
+                if self.on_error:
+                    try:
+                        self.on_error(name, item)
+                    except Exception as hook_error:
+                        logger.error(f'Error handling {name} stage failure for {label}: {hook_error}')
+                continue
+            
+            if outbox is not None and result is not None:
+                outbox.put(result)
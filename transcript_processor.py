@@ -1,16 +1,28 @@
 #!/usr/bin/env python3
 import os
 import time
+import re
 import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import openai
-from supabase import create_client, Client
+from supabase import Client
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from dotenv import load_dotenv
+from llm_cache import LLMCache
+from chunking import chunk_text, estimate_tokens
+from supabase_client import get_supabase_client, iter_rows
+from transcript_pipeline import TranscriptPipeline
+from video_catalog import VideoCatalog
+from transcript_manifest import TranscriptManifest
+from write_buffer import get_write_buffer
+from transcript_codec import TranscriptCodec, read_transcript
+from embeddings import EmbeddingStage
 
 load_dotenv()
 
@@ -21,27 +33,109 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Downloader output names end in "[<YouTube video ID>]"
+VIDEO_ID_SUFFIX = re.compile(r'\s*\[([0-9A-Za-z_-]{11})\]$')
+
+class FileStabilityDebouncer:
+    """Releases pending files once their size and mtime stop changing"""
+    
+    def __init__(self, callback, stable_seconds: float, poll_interval: float):
+        self.callback = callback
+        self.stable_seconds = stable_seconds
+        self.poll_interval = poll_interval
+        self._pending = {}  # path -> ((size, mtime_ns), unchanged since)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='transcript-debouncer', daemon=True)
+    
+    def add(self, path: str):
+        """Start tracking a path; repeated events for a pending path are ignored"""
+        with self._lock:
+            self._pending.setdefault(path, None)
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+    
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self._poll()
+            except Exception as e:
+                logger.error(f'Error polling pending transcripts: {e}')
+    
+    def _poll(self):
+        now = time.monotonic()
+        ready = []
+        
+        with self._lock:
+            for path, state in list(self._pending.items()):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    del self._pending[path]
+                    continue
+                
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if state is None or state[0] != signature:
+                    self._pending[path] = (signature, now)
+                elif stat.st_size > 0 and now - state[1] >= self.stable_seconds:
+                    del self._pending[path]
+                    ready.append(path)
+        
+        for path in ready:
+            self.callback(path)
+
 class TranscriptHandler(FileSystemEventHandler):
-    def __init__(self, processor):
+    """Only enqueues paths; stability checks and processing happen off the observer thread"""
+    
+    def __init__(self, processor, pipeline):
         self.processor = processor
+        self.pipeline = pipeline
         self.pattern = os.getenv('TRANSCRIPT_FILE_PATTERN', '*_transcript.txt')
+        
+        self.debouncer = FileStabilityDebouncer(
+            self._submit,
+            stable_seconds=float(os.getenv('TRANSCRIPT_STABLE_SECONDS', '2')),
+            poll_interval=float(os.getenv('TRANSCRIPT_POLL_INTERVAL', '0.5'))
+        )
+    
+    def start(self):
+        self.debouncer.start()
+    
+    def stop(self):
+        self.debouncer.stop()
+    
+    def _submit(self, path: str):
+        logger.info(f'Transcript stable, queuing for processing: {path}')
+        # Blocks when the pipeline is saturated, holding files in the debouncer
+        self.pipeline.submit(path)
+    
+    def _enqueue(self, path: str):
+        if path.endswith('_transcript.txt'):
+            logger.info(f'New transcript detected: {path}')
+            self.debouncer.add(path)
     
     def on_created(self, event):
-        if not event.is_directory and event.src_path.endswith('_transcript.txt'):
-            logger.info(f'New transcript detected: {event.src_path}')
-            # Wait a bit to ensure file is completely written
-            time.sleep(2)
-            self.processor.process_transcript(event.src_path)
+        if not event.is_directory:
+            self._enqueue(event.src_path)
+    
+    def on_moved(self, event):
+        # Writers that save to a temp file and rename into place
+        if not event.is_directory:
+            self._enqueue(event.dest_path)
 
 class TranscriptProcessor:
     def __init__(self):
         self.watched_folder = os.getenv('WATCHED_FOLDER', '')
         
         # Initialize Supabase
-        self.supabase: Client = create_client(
-            os.getenv('SUPABASE_URL'),
-            os.getenv('SUPABASE_KEY')
-        )
+        self.supabase: Client = get_supabase_client()
+        self.write_buffer = get_write_buffer()
+        self.codec = TranscriptCodec.from_env()
         
         # Initialize OpenRouter (uses OpenAI client)
         self.openai_client = openai.Client(
@@ -63,132 +157,399 @@ class TranscriptProcessor:
             'keywords': 'anthropic/claude-3-haiku',
             'insights': 'anthropic/claude-3-sonnet'
         }
+        
+        # Optional single-call mode that asks one model for every processing type
+        self.combined_mode = os.getenv('AI_COMBINED_MODE', 'false').lower() == 'true'
+        self.combined_model = os.getenv('AI_COMBINED_MODEL', 'anthropic/claude-3-sonnet')
+        self.combined_prompt = """Analyze this YouTube video transcript and return a single JSON object with exactly these keys: "summary": a 3-5 paragraph summary including key points and main takeaways (string), "chapters": chapter timestamps, one per line formatted as [HH:MM:SS] Chapter Title (string), "keywords": 10-15 important keywords/phrases focusing on technical terms, topics, and key concepts (array of strings), "insights": an object with 1. main topic and subtopics, 2. key insights or learnings, 3. actionable takeaways, 4. related topics to explore. Return only the JSON object. Transcript: {transcript}"""
+        
+        # Persistent response cache; set LLM_CACHE_PATH empty to disable
+        cache_path = os.getenv('LLM_CACHE_PATH', 'llm_cache.sqlite3')
+        self.llm_cache = LLMCache(
+            cache_path,
+            int(float(os.getenv('LLM_CACHE_MAX_MB', '256')) * 1024 * 1024)
+        ) if cache_path else None
+        
+        # Shared pool bounding concurrent OpenRouter calls across transcripts
+        self.ai_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('AI_CONCURRENCY', str(len(self.prompts)))),
+            thread_name_prefix='ai'
+        )
+        
+        # Map-reduce over long transcripts instead of truncating them
+        self.map_reduce = os.getenv('AI_MAP_REDUCE', 'false').lower() == 'true'
+        self.chunk_tokens = int(os.getenv('AI_CHUNK_TOKENS', '2000'))
+        self.chunk_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('AI_CHUNK_CONCURRENCY', '8')),
+            thread_name_prefix='ai-chunk'
+        )
+        
+        # In-memory index of videos used to match transcript files
+        self.video_catalog = VideoCatalog(float(os.getenv('VIDEO_CATALOG_REFRESH_SECONDS', '300')))
+        
+        # Optional local embedding stage (EMBEDDING_MODEL unset disables it)
+        self.embedding_stage = EmbeddingStage.from_env()
+        
+        # Local record of processed files so restarts only look at new or changed ones
+        self.manifest = TranscriptManifest(os.getenv('TRANSCRIPT_MANIFEST_PATH', 'transcript_manifest.sqlite3'))
+        
+        # Staged ingest -> DB write -> embed -> AI pipeline fed by the watcher and startup scan
+        self.pipeline = TranscriptPipeline(self, on_error=self.mark_transcript_failed)
     
     def find_video_by_filename(self, transcript_path: str) -> Optional[Dict]:
         """Find video record by matching filename pattern"""
         filename = Path(transcript_path).stem.replace('_transcript', '')
         
-        # Try to extract video info from filename
+        # Exact lookup when the filename carries the video ID
+        id_match = VIDEO_ID_SUFFIX.search(filename)
+        if id_match:
+            youtube_id = id_match.group(1)
+            video = self.video_catalog.get_by_video_id(youtube_id)
+            if video:
+                return video
+            result = self.supabase.table('videos').select('*').eq('video_id', youtube_id).limit(1).execute()
+            if result.data:
+                return result.data[0]
+            filename = filename[:id_match.start()]
+        
+        # Fall back to title matching for old-style names
         # Expected format: YYYYMMDD_Title
         parts = filename.split('_', 1)
         if len(parts) >= 2:
             date_str = parts[0]
             title_part = parts[1]
             
-            # Search for video by title similarity
-            result = self.supabase.table('videos').select('*').ilike('title', f'%{title_part[:20]}%').execute()
-            if result.data:
-                return result.data[0]
+            # Match against the in-memory catalog by normalized title and date
+            return self.video_catalog.match(title_part, date_str)
         
         return None
     
+    def ingest_transcript(self, transcript_path: str) -> Optional[Dict]:
+        """Match a transcript file to its video, then read it"""
+        # Find associated video
+        video = self.find_video_by_filename(transcript_path)
+        if not video:
+            logger.warning(f'Could not find video for transcript: {transcript_path}')
+            self.manifest.record(transcript_path, 'unmatched')
+            return None
+        
+        # Read transcript, counting words and hashing in the same pass
+        transcript = read_transcript(transcript_path)
+        return dict(transcript, path=transcript_path, video=video)
+    
+    def save_transcript(self, item: Dict) -> Dict:
+        """Insert an ingested transcript and return the item with its transcript ID"""
+        transcript_record = self.supabase.table('transcripts').insert({
+            'video_id': item['video']['id'],
+            'word_count': item['word_count'],
+            'language': 'en',
+            'transcribed_at': datetime.now().isoformat(),
+            **self.codec.storage_fields(item['text'])
+        }).execute()
+        
+        logger.info(f'Saved transcript for video: {item["video"]["title"]}')
+        self.manifest.record(item['path'], 'processed', item['video']['id'], content_hash=item['content_hash'])
+        return dict(item, transcript_id=transcript_record.data[0]['id'])
+    
+    def embed_transcript(self, item: Dict) -> Dict:
+        """Embed a saved transcript's chunks; always passes the item on to AI processing"""
+        if self.embedding_stage:
+            try:
+                self.embedding_stage.embed_transcript(item['transcript_id'], item['video'], item['text'])
+            except Exception as e:
+                # Left without embedded_at, so the startup backfill retries it
+                logger.error(f'Error embedding transcript {item["transcript_id"]}: {e}')
+        return item
+    
+    def backfill_embeddings(self):
+        """Resume embedding for transcripts an earlier run didn't finish"""
+        try:
+            done = self.embedding_stage.backfill(self.codec, self.video_catalog.get)
+            logger.info(f'Embedding backfill completed for {done} transcripts')
+        except Exception as e:
+            logger.error(f'Error in embedding backfill: {e}')
+    
+    def enrich_transcript(self, item: Dict):
+        """Run AI processing for a saved transcript"""
+        self.process_with_ai(item['transcript_id'], item['text'])
+        if self.llm_cache:
+            logger.info(f'LLM cache: {self.llm_cache.summary()}')
+    
+    def mark_transcript_failed(self, stage: str, item):
+        """Pipeline error hook: record the file as failed so the next scan retries it"""
+        if stage != 'ai':
+            self.manifest.record(item if isinstance(item, str) else item['path'], 'failed')
+    
     def process_transcript(self, transcript_path: str):
-        """Process a new transcript file"""
+        """Process a new transcript file inline on the calling thread"""
         try:
-            # Read transcript
-            with open(transcript_path, 'r', encoding='utf-8') as f:
-                transcript_text = f.read()
-            
-            # Find associated video
-            video = self.find_video_by_filename(transcript_path)
-            if not video:
-                logger.warning(f'Could not find video for transcript: {transcript_path}')
+            item = self.ingest_transcript(transcript_path)
+            if not item:
                 return
-            
-            # Save transcript to database
-            word_count = len(transcript_text.split())
-            transcript_record = self.supabase.table('transcripts').insert({
-                'video_id': video['id'],
-                'raw_transcript': transcript_text,
-                'transcript_format': 'txt',
-                'word_count': word_count,
-                'language': 'en',
-                'transcribed_at': datetime.now().isoformat()
-            }).execute()
-            
-            transcript_id = transcript_record.data[0]['id']
-            logger.info(f'Saved transcript for video: {video["title"]}')
-            
-            # Process with AI
-            self.process_with_ai(transcript_id, transcript_text)
-            
+            self.enrich_transcript(self.embed_transcript(self.save_transcript(item)))
         except Exception as e:
             logger.error(f'Error processing transcript {transcript_path}: {e}')
     
     def process_with_ai(self, transcript_id: str, transcript_text: str):
-        """Process transcript with OpenRouter AI models"""
-        for process_type, prompt_template in self.prompts.items():
+        """Process transcript with OpenRouter AI models, all types concurrently"""
+        # Long transcripts go through per-type map-reduce rather than one truncated combined call
+        if self.combined_mode and not self.needs_map_reduce(transcript_text):
+            self.run_combined_processing(transcript_id, transcript_text)
+            return
+        
+        self.run_processing_types(transcript_id, list(self.prompts), transcript_text)
+    
+    def run_processing_types(self, transcript_id: str, process_types: List[str], transcript_text: str):
+        """Run the given processing types concurrently and wait for all of them"""
+        futures = [
+            self.ai_executor.submit(self.run_processing_type, transcript_id, process_type, transcript_text)
+            for process_type in process_types
+        ]
+        wait(futures)
+    
+    def chat(self, model: str, prompt: str, max_tokens: int = 1000):
+        """Send a single-prompt chat completion to OpenRouter"""
+        return self.openai_client.chat.completions.create(
+            model=model,
+            messages=[{
+                'role': 'user',
+                'content': prompt
+            }],
+            temperature=0.7,
+            max_tokens=max_tokens
+        )
+    
+    def complete(self, model: str, prompt_template: str, transcript: str,
+                 max_tokens: int = 1000) -> Tuple[str, Optional[int]]:
+        """Return (content, tokens used) for a prompt, served from the LLM cache when possible"""
+        key = None
+        if self.llm_cache:
+            params = {'temperature': 0.7, 'max_tokens': max_tokens}
+            key = LLMCache.make_key(model, prompt_template, transcript, params)
+            cached = self.llm_cache.get(key)
+            if cached:
+                return cached['content'], cached['tokens_used']
+        
+        response = self.chat(model, prompt_template.format(transcript=transcript), max_tokens)
+        content = response.choices[0].message.content
+        tokens_used = response.usage.total_tokens if hasattr(response.usage, 'total_tokens') else None
+        
+        if key:
+            self.llm_cache.put(key, content, tokens_used)
+        return content, tokens_used
+    
+    def needs_map_reduce(self, transcript_text: str) -> bool:
+        return self.map_reduce and estimate_tokens(transcript_text) > self.chunk_tokens
+    
+    def _pack_parts(self, parts: List[str]) -> List[List[str]]:
+        """Group partial results into reduce batches that fit the chunk budget"""
+        groups, current, current_tokens = [], [], 0
+        for part in parts:
+            tokens = estimate_tokens(part)
+            # Always pair at least two parts so every reduce round shrinks the list
+            if len(current) >= 2 and current_tokens + tokens > self.chunk_tokens:
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += tokens
+        if current:
+            groups.append(current)
+        return groups
+    
+    def map_reduce_complete(self, process_type: str, transcript_text: str) -> Tuple[str, Optional[int]]:
+        """Run a processing type over token-budgeted chunks and merge the results"""
+        template = self.prompts[process_type]
+        model = self.models[process_type]
+        instructions = template.split('Transcript:')[0].strip()
+        map_template = 'The following is one section of a longer video transcript. ' + template
+        reduce_template = (
+            f'The following are {process_type} results for consecutive sections of one long video '
+            f'transcript, in order. Merge them into a single result for the whole video, following '
+            f'the original instructions: {instructions} Section results: ' + '{transcript}'
+        )
+        
+        # Map: chunks are cached individually, so unchanged chunks are never re-sent
+        chunks = chunk_text(transcript_text, self.chunk_tokens)
+        results = list(self.chunk_executor.map(
+            lambda chunk: self.complete(model, map_template, chunk['text']), chunks
+        ))
+        tokens_used = sum(tokens or 0 for _, tokens in results)
+        parts = [content for content, _ in results]
+        
+        # Reduce, in several rounds if the partial results don't fit one prompt
+        while len(parts) > 1:
+            groups = self._pack_parts(parts)
+            results = list(self.chunk_executor.map(
+                lambda group: self.complete(model, reduce_template, '\n\n---\n\n'.join(group)), groups
+            ))
+            tokens_used += sum(tokens or 0 for _, tokens in results)
+            parts = [content for content, _ in results]
+        
+        logger.info(f'Map-reduced {process_type} over {len(chunks)} chunks')
+        return parts[0], tokens_used or None
+    
+    def parse_content(self, process_type: str, content: str) -> Dict:
+        """Parse a model response into the stored content shape for its type"""
+        if process_type == 'keywords':
+            return {'keywords': [k.strip() for k in content.split(',')]}
+        elif process_type == 'insights':
             try:
-                start_time = time.time()
-                
-                # Prepare prompt
-                prompt = prompt_template.format(transcript=transcript_text[:8000])  # Limit context
-                
-                # Call OpenRouter
-                response = self.openai_client.chat.completions.create(
-                    model=self.models[process_type],
-                    messages=[{
-                        'role': 'user',
-                        'content': prompt
-                    }],
-                    temperature=0.7,
-                    max_tokens=1000
+                return json.loads(content)
+            except ValueError:
+                return {'raw': content}
+        return {'content': content}
+    
+    def save_processed_content(self, transcript_id: str, process_type: str, content_json: Dict,
+                               model: str, tokens_used: Optional[int], processing_time: int):
+        """Queue one processed_content row for a batched insert"""
+        self.write_buffer.insert('processed_content', {
+            'transcript_id': transcript_id,
+            'processing_type': process_type,
+            'content': content_json,
+            'model_used': model,
+            'tokens_used': tokens_used,
+            'processing_time_ms': processing_time
+        })
+    
+    def run_processing_type(self, transcript_id: str, process_type: str, transcript_text: str):
+        """Run a single processing type and persist its result as soon as it arrives"""
+        try:
+            start_time = time.time()
+            
+            # Call OpenRouter (or the cache), map-reducing long transcripts when enabled
+            if self.needs_map_reduce(transcript_text):
+                content, tokens_used = self.map_reduce_complete(process_type, transcript_text)
+            else:
+                content, tokens_used = self.complete(
+                    self.models[process_type], self.prompts[process_type], transcript_text[:8000]  # Limit context
                 )
-                
-                # Extract content
-                content = response.choices[0].message.content
-                
-                # Parse content based on type
-                if process_type == 'keywords':
-                    content_json = {'keywords': [k.strip() for k in content.split(',')]}
-                elif process_type == 'insights':
-                    try:
-                        content_json = json.loads(content)
-                    except:
-                        content_json = {'raw': content}
-                else:
-                    content_json = {'content': content}
-                
-                # Save to database
-                processing_time = int((time.time() - start_time) * 1000)
-                
-                self.supabase.table('processed_content').insert({
-                    'transcript_id': transcript_id,
-                    'processing_type': process_type,
-                    'content': content_json,
-                    'model_used': self.models[process_type],
-                    'tokens_used': response.usage.total_tokens if hasattr(response.usage, 'total_tokens') else None,
-                    'processing_time_ms': processing_time
-                }).execute()
-                
-                logger.info(f'Completed {process_type} processing for transcript {transcript_id}')
-                
-            except Exception as e:
-                logger.error(f'Error in {process_type} processing: {e}')
+            
+            # Parse content based on type
+            content_json = self.parse_content(process_type, content)
+            
+            # Save to database
+            processing_time = int((time.time() - start_time) * 1000)
+            self.save_processed_content(transcript_id, process_type, content_json,
+                                        self.models[process_type], tokens_used, processing_time)
+            
+            logger.info(f'Completed {process_type} processing for transcript {transcript_id}')
+            
+        except Exception as e:
+            logger.error(f'Error in {process_type} processing: {e}')
+    
+    def split_combined_response(self, content: str) -> Dict[str, Dict]:
+        """Split a combined JSON response into per-type content, skipping unusable parts"""
+        start, end = content.find('{'), content.rfind('}')
+        if start == -1 or end <= start:
+            return {}
+        try:
+            combined = json.loads(content[start:end + 1])
+        except ValueError:
+            return {}
+        if not isinstance(combined, dict):
+            return {}
+        
+        results = {}
+        for process_type in self.prompts:
+            value = combined.get(process_type)
+            if not value:
+                continue
+            if isinstance(value, str):
+                results[process_type] = self.parse_content(process_type, value)
+            elif process_type == 'keywords' and isinstance(value, list):
+                results[process_type] = {'keywords': [str(k).strip() for k in value]}
+            elif process_type == 'insights' and isinstance(value, dict):
+                results[process_type] = value
+            elif isinstance(value, list):
+                results[process_type] = {'content': '\n'.join(str(v) for v in value)}
+        return results
+    
+    def run_combined_processing(self, transcript_id: str, transcript_text: str):
+        """Ask one model for all processing types, falling back per type on parse failure"""
+        saved = set()
+        try:
+            start_time = time.time()
+            content, total_tokens = self.complete(
+                self.combined_model, self.combined_prompt, transcript_text[:8000],
+                max_tokens=1000 * len(self.prompts)
+            )
+            results = self.split_combined_response(content)
+            
+            processing_time = int((time.time() - start_time) * 1000)
+            # Attribute an even share of the single call to each row
+            tokens_used = total_tokens // len(self.prompts) if total_tokens else None
+            
+            for process_type, content_json in results.items():
+                self.save_processed_content(transcript_id, process_type, content_json,
+                                            self.combined_model, tokens_used, processing_time)
+                saved.add(process_type)
+                logger.info(f'Completed {process_type} processing for transcript {transcript_id} (combined)')
+        except Exception as e:
+            logger.error(f'Error in combined processing: {e}')
+        
+        missing = [process_type for process_type in self.prompts if process_type not in saved]
+        if missing:
+            logger.warning(f'Combined response missing {", ".join(missing)}; falling back to per-type calls')
+            self.run_processing_types(transcript_id, missing, transcript_text)
+    
+    def fetch_transcribed_video_ids(self) -> set:
+        """Return IDs of videos that already have a transcript, in one paginated pass"""
+        return {row['video_id'] for row in iter_rows('transcripts', 'id, video_id')}
     
     def scan_existing_transcripts(self):
-        """Scan for existing transcript files on startup"""
+        """Scan for new or changed transcript files on startup"""
         logger.info(f'Scanning for existing transcripts in {self.watched_folder}')
+        if self.manifest.is_empty():
+            logger.info('Transcript manifest is empty; rebuilding it from the database')
+        
+        # Membership checks happen in memory against one bulk fetch, made
+        # only if some file actually needs evaluating
+        transcribed = None
+        queued = skipped = 0
         
         for transcript_file in Path(self.watched_folder).rglob('*_transcript.txt'):
-            # Check if already processed
-            filename = transcript_file.stem.replace('_transcript', '')
-            video = self.find_video_by_filename(str(transcript_file))
+            path = str(transcript_file)
+            try:
+                stat = transcript_file.stat()
+                if self.manifest.is_processed(path, stat):
+                    skipped += 1
+                    continue
+            except FileNotFoundError:
+                continue
             
-            if video:
-                # Check if transcript already exists
-                existing = self.supabase.table('transcripts').select('id').eq('video_id', video['id']).execute()
-                if not existing.data:
-                    logger.info(f'Processing existing transcript: {transcript_file}')
-                    self.process_transcript(str(transcript_file))
+            if transcribed is None:
+                transcribed = self.fetch_transcribed_video_ids()
+            
+            video = self.find_video_by_filename(path)
+            if not video:
+                self.manifest.record(path, 'unmatched', stat=stat)
+                continue
+            
+            # Check if transcript already exists
+            if video['id'] in transcribed:
+                self.manifest.record(path, 'processed', video['id'], stat=stat)
+                continue
+            
+            logger.info(f'Processing existing transcript: {transcript_file}')
+            transcribed.add(video['id'])
+            self.manifest.record(path, 'queued', video['id'], stat=stat)
+            self.pipeline.submit(path)
+            queued += 1
+        
+        logger.info(f'Startup scan queued {queued} transcripts, {skipped} unchanged since last run')
     
     def run(self):
         """Start watching for transcripts"""
+        self.pipeline.start()
+        
         # First scan for existing files
         self.scan_existing_transcripts()
+        if self.embedding_stage:
+            threading.Thread(target=self.backfill_embeddings, name='embedding-backfill', daemon=True).start()
         
         # Set up file watcher
-        event_handler = TranscriptHandler(self)
+        event_handler = TranscriptHandler(self, self.pipeline)
+        event_handler.start()
         observer = Observer()
         observer.schedule(event_handler, self.watched_folder, recursive=True)
         observer.start()
@@ -201,6 +562,10 @@ class TranscriptProcessor:
         except KeyboardInterrupt:
             observer.stop()
         observer.join()
+        event_handler.stop()
+        self.pipeline.stop()
+        self.write_buffer.flush()
+        logger.info(f'Write buffer: {self.write_buffer.summary()}')
 
 if __name__ == '__main__':
     processor = TranscriptProcessor()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+import time
+import bisect
+import logging
+import threading
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from supabase_client import iter_rows
+
+logger = logging.getLogger(__name__)
+
+# Re-read rows created slightly before the watermark to cover commit-order skew
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+def normalize_title(title: str) -> str:
+    """Reduce a title to casefolded letters and digits.
+    
+    yt-dlp sanitizes titles for filenames (e.g. ':' becomes a fullwidth colon),
+    so punctuation and spacing are dropped on both sides of the comparison.
+    """
+    return ''.join(ch for ch in unicodedata.normalize('NFKC', title or '').casefold() if ch.isalnum())
+
+class VideoCatalog:
+    """In-memory index of videos for matching transcript files without per-file queries"""
+    
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._by_id: Dict = {}
+        self._by_video_id: Dict[str, Dict] = {}
+        self._by_title: Dict[str, List[Dict]] = {}
+        self._titles: List[str] = []  # sorted, for prefix lookups
+        self._watermark: Optional[str] = None
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._by_id)
+    
+    def _add(self, row: Dict):
+        if row['id'] in self._by_id:
+            return False
+        self._by_id[row['id']] = row
+        if row.get('video_id'):
+            self._by_video_id[row['video_id']] = row
+        
+        key = normalize_title(row.get('title'))
+        if key:
+            if key not in self._by_title:
+                self._by_title[key] = []
+                bisect.insort(self._titles, key)
+            self._by_title[key].append(row)
+        
+        created_at = row.get('created_at')
+        if created_at and (self._watermark is None or created_at > self._watermark):
+            self._watermark = created_at
+        return True
+    
+    def refresh(self):
+        """Load videos created since the last refresh (everything on first use)"""
+        with self._lock:
+            filters = None
+            if self._watermark:
+                try:
+                    since = (datetime.fromisoformat(self._watermark) - WATERMARK_OVERLAP).isoformat()
+                except ValueError:
+                    since = self._watermark
+                filters = lambda query: query.gte('created_at', since)
+            
+            added = sum(
+                self._add(row)
+                for row in iter_rows('videos', 'id, video_id, title, upload_date, duration, created_at', filters=filters)
+            )
+            self._last_refresh = time.monotonic()
+        
+        if added:
+            logger.info(f'Video catalog: {added} videos added, {len(self._by_id)} total')
+    
+    def maybe_refresh(self, force: bool = False) -> bool:
+        """Refresh if the catalog is empty, stale, or force is set and the last refresh isn't brand new"""
+        age = time.monotonic() - self._last_refresh
+        if not self._last_refresh or age > self.refresh_interval or (force and age > 1):
+            self.refresh()
+            return True
+        return False
+    
+    def _lookup(self, title: str, upload_date: Optional[str]) -> Optional[Dict]:
+        key = normalize_title(title)
+        if not key:
+            return None
+        
+        candidates = self._by_title.get(key)
+        if not candidates:
+            # Filenames may carry a truncated title; take titles sharing the prefix
+            candidates = []
+            index = bisect.bisect_left(self._titles, key)
+            while index < len(self._titles) and self._titles[index].startswith(key):
+                candidates.extend(self._by_title[self._titles[index]])
+                index += 1
+        if not candidates:
+            return None
+        
+        if upload_date:
+            for row in candidates:
+                if (row.get('upload_date') or '').replace('-', '') == upload_date:
+                    return row
+        return candidates[0]
+    
+    def get(self, id) -> Optional[Dict]:
+        """Find a video by its database ID"""
+        self.maybe_refresh()
+        with self._lock:
+            return self._by_id.get(id)
+    
+    def get_by_video_id(self, video_id: str) -> Optional[Dict]:
+        """Find a video by its YouTube ID among catalogued rows"""
+        self.maybe_refresh()
+        with self._lock:
+            return self._by_video_id.get(video_id)
+    
+    def match(self, title: str, upload_date: Optional[str] = None) -> Optional[Dict]:
+        """Find a video by title (and upload date as YYYYMMDD when known)"""
+        self.maybe_refresh()
+        with self._lock:
+            video = self._lookup(title, upload_date)
+        
+        # The video may have been inserted after the last refresh
+        if video is None and self.maybe_refresh(force=True):
+            with self._lock:
+                video = self._lookup(title, upload_date)
+        return video
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+import os
+import time
+import atexit
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+from supabase_client import get_supabase_client
+
+logger = logging.getLogger(__name__)
+
+# Placeholder value replaced with one timestamp per flush, so rows stamped with
+# it still share a payload and batch together
+FLUSH_TIME = object()
+
+class WriteBuffer:
+    """Write-behind buffer that coalesces row writes into batched PostgREST requests.
+    
+    - inserts are grouped per table (and column set) into multi-row inserts
+    - upserts are grouped per table/conflict target; later rows for the same
+      key replace earlier ones
+    - updates are merged per row, then rows with identical payloads share one
+      update ... in_() request
+    
+    Use FLUSH_TIME for timestamp columns; a per-call datetime.now() would make
+    every update payload unique.
+    
+    Buffers flush when max_rows writes are pending or every flush_interval seconds.
+    """
+    
+    def __init__(self, max_rows: int, flush_interval: float):
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        
+        self._inserts: Dict[tuple, List[Dict]] = {}
+        self._upserts: Dict[tuple, Dict] = {}
+        self._updates: Dict[tuple, Dict] = {}
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        
+        # Flush metrics
+        self.flushes = 0
+        self.requests = 0
+        self.rows = 0
+        self.max_batch = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        
+        self._thread = threading.Thread(target=self._run, name='write-buffer', daemon=True)
+        self._thread.start()
+    
+    def _added(self):
+        self._pending += 1
+        if self._pending >= self.max_rows:
+            self._cond.notify()
+    
+    def insert(self, table: str, row: Dict):
+        with self._cond:
+            self._inserts.setdefault((table, tuple(sorted(row))), []).append(row)
+            self._added()
+    
+    def upsert(self, table: str, row: Dict, on_conflict: str):
+        key = tuple(row[column] for column in on_conflict.split(','))
+        with self._cond:
+            rows = self._upserts.setdefault((table, on_conflict, tuple(sorted(row))), {})
+            if key in rows:
+                rows[key].update(row)
+            else:
+                rows[key] = dict(row)
+                self._added()
+    
+    def update(self, table: str, payload: Dict, key_column: str, key_value):
+        with self._cond:
+            target = (table, key_column, key_value)
+            if target in self._updates:
+                self._updates[target].update(payload)
+            else:
+                self._updates[target] = dict(payload)
+                self._added()
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and self._pending < self.max_rows:
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            self.flush()
+            if closed:
+                break
+    
+    def _take(self):
+        with self._cond:
+            inserts, upserts, updates = self._inserts, self._upserts, self._updates
+            self._inserts, self._upserts, self._updates = {}, {}, {}
+            self._pending = 0
+        return inserts, upserts, updates
+    
+    def _execute(self, description: str, size: int, request):
+        try:
+            request.execute()
+        except Exception as e:
+            logger.error(f'Error flushing {description} ({size} rows): {e}')
+            return False
+        finally:
+            self.requests += 1
+            self.max_batch = max(self.max_batch, size)
+        return True
+    
+    @staticmethod
+    def _stamp(row: Dict, now: str) -> Dict:
+        return {k: now if v is FLUSH_TIME else v for k, v in row.items()}
+    
+    def flush(self):
+        """Send every pending write now"""
+        with self._flush_lock:
+            inserts, upserts, updates = self._take()
+            start = time.time()
+            now = datetime.now().isoformat()
+            client = get_supabase_client()
+            rows = 0
+            
+            for (table, _), batch in inserts.items():
+                batch = [self._stamp(row, now) for row in batch]
+                for i in range(0, len(batch), self.max_rows):
+                    chunk = batch[i:i + self.max_rows]
+                    ok = self._execute(f'{table} insert', len(chunk), client.table(table).insert(chunk))
+                    if not ok and len(chunk) > 1:
+                        # Isolate bad rows so one failure doesn't drop the whole batch
+                        for row in chunk:
+                            self._execute(f'{table} insert', 1, client.table(table).insert(row))
+                    rows += len(chunk)
+            
+            for (table, on_conflict, _), keyed in upserts.items():
+                batch = [self._stamp(row, now) for row in keyed.values()]
+                for i in range(0, len(batch), self.max_rows):
+                    chunk = batch[i:i + self.max_rows]
+                    self._execute(f'{table} upsert', len(chunk),
+                                  client.table(table).upsert(chunk, on_conflict=on_conflict))
+                    rows += len(chunk)
+            
+            # Rows sharing an identical payload are updated together
+            grouped: Dict[tuple, List] = {}
+            for (table, key_column, key_value), payload in updates.items():
+                payload = self._stamp(payload, now)
+                signature = (table, key_column, tuple(sorted((k, repr(v)) for k, v in payload.items())))
+                grouped.setdefault(signature, [payload, []])[1].append(key_value)
+            for (table, key_column, _), (payload, key_values) in grouped.items():
+                for i in range(0, len(key_values), self.max_rows):
+                    chunk = key_values[i:i + self.max_rows]
+                    self._execute(f'{table} update', len(chunk),
+                                  client.table(table).update(payload).in_(key_column, chunk))
+                    rows += len(chunk)
+            
+            if rows:
+                latency = time.time() - start
+                self.flushes += 1
+                self.rows += rows
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+                logger.debug(f'Flushed {rows} buffered writes in {latency * 1000:.0f}ms')
+    
+    def close(self):
+        """Stop the background flusher after a final flush"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        # Catch anything written while the flusher was finishing
+        self.flush()
+    
+    def summary(self) -> str:
+        if not self.flushes:
+            return 'no buffered writes flushed'
+        return (f'{self.rows} rows in {self.flushes} flushes / {self.requests} requests '
+                f'(avg batch {self.rows / max(self.requests, 1):.1f}, max {self.max_batch}; '
+                f'avg flush {self.total_latency / self.flushes * 1000:.0f}ms, max {self.max_latency * 1000:.0f}ms)')
+
+_buffer: Optional[WriteBuffer] = None
+_buffer_lock = threading.Lock()
+
+def get_write_buffer() -> WriteBuffer:
+    """Return the process-wide write buffer, flushed automatically at exit"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = WriteBuffer(
+                max_rows=int(os.getenv('WRITE_BUFFER_MAX_ROWS', '200')),
+                flush_interval=float(os.getenv('WRITE_BUFFER_FLUSH_SECONDS', '2'))
+            )
+            atexit.register(_buffer.close)
+        return _buffer
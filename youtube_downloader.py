@@ -2,13 +2,20 @@
 import os
 import sys
 import json
+import time
 import logging
-from datetime import datetime
+import itertools
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional
 import yt_dlp
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
+from supabase_client import get_supabase_client, iter_rows
+from write_buffer import FLUSH_TIME, get_write_buffer
 
 load_dotenv()
 
@@ -19,6 +26,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Keep in_() filters and bulk writes well under PostgREST URL/body limits
+BATCH_SIZE = 200
+
+def chunked(items: List, size: int = BATCH_SIZE) -> Iterator[List]:
+    """Split a list into consecutive batches"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
 class YouTubeDownloader:
     def __init__(self):
         self.channel_list = os.getenv('CHANNEL_LIST', '').split(',')
@@ -26,22 +41,50 @@ class YouTubeDownloader:
         self.watched_folder = os.getenv('WATCHED_FOLDER', '')
         self.max_videos = int(os.getenv('MAX_VIDEOS_PER_RUN', '10'))
         self.video_quality = os.getenv('VIDEO_QUALITY', 'best')
+        self.audio_only = os.getenv('AUDIO_ONLY', 'false').lower() == 'true'
+        self.audio_format = os.getenv('AUDIO_FORMAT', 'bestaudio[ext=m4a]/bestaudio')
+        # 'worst' would rank by language too and pick a dubbed track; keep the
+        # original language first, then prefer the smallest stream
+        self.audio_format_sort = [f for f in os.getenv('AUDIO_FORMAT_SORT', 'lang,+size,+br').split(',') if f]
+        self.channel_concurrency = max(1, int(os.getenv('CHANNEL_CONCURRENCY', '1')))
+        self.download_workers = max(1, int(os.getenv('DOWNLOAD_WORKERS', '2')))
+        self.run_budget = int(os.getenv('RUN_VIDEO_BUDGET', '0'))  # 0 = unlimited
+        self.flat_discovery = os.getenv('FLAT_DISCOVERY', 'true').lower() == 'true'
+        self.channel_sync_ttl = timedelta(hours=float(os.getenv('CHANNEL_SYNC_TTL_HOURS', '24')))
+        # Stream URLs in YouTube metadata expire after ~6 hours
+        self.info_cache_dir = os.getenv('INFO_CACHE_DIR', os.path.join(self.download_path, 'info_cache'))
+        self.info_cache_ttl = float(os.getenv('INFO_CACHE_TTL_HOURS', '3')) * 3600
+        self.max_download_attempts = max(1, int(os.getenv('MAX_DOWNLOAD_ATTEMPTS', '3')))
+        
+        # Video IDs known to be in the database during this run
+        self._known_video_ids = set()
+        self._known_lock = threading.Lock()
+        
+        # Failed downloads still under the attempt limit: video ID -> attempts so far
+        self._retry_attempts = {}
+        self._retry_entries = {}
+        
+        # Per-run download queue state
+        self._state_lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._channel_stats = {}
+        self._claimed = 0
         
         # Initialize Supabase
-        self.supabase: Client = create_client(
-            os.getenv('SUPABASE_URL'),
-            os.getenv('SUPABASE_KEY')
-        )
+        self.supabase: Client = get_supabase_client()
+        self.write_buffer = get_write_buffer()
         
         # Create directories
         Path(self.download_path).mkdir(parents=True, exist_ok=True)
+        Path(self.info_cache_dir).mkdir(parents=True, exist_ok=True)
         if self.watched_folder:
             Path(self.watched_folder).mkdir(parents=True, exist_ok=True)
         
         # Configure yt-dlp
         self.ydl_opts = {
             'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-            'outtmpl': os.path.join(self.watched_folder, '%(channel)s/%(upload_date)s_%(title)s.%(ext)s'),
+            # The [video ID] suffix lets the transcript processor resolve files exactly
+            'outtmpl': os.path.join(self.watched_folder, '%(channel)s/%(upload_date)s_%(title)s [%(id)s].%(ext)s'),
             'download_archive': 'downloaded.txt',
             'postprocessors': [{
                 'key': 'FFmpegExtractAudio',
@@ -56,106 +99,454 @@ class YouTubeDownloader:
             'ignoreerrors': True,
             'extract_flat': False,
         }
+        
+        if self.audio_only:
+            # Fetch the smallest audio stream directly; no muxing or transcoding
+            self.ydl_opts.update({
+                'format': self.audio_format,
+                'format_sort': self.audio_format_sort,
+                'postprocessors': [],
+                'keepvideo': False,
+            })
+    
+    def get_synced_channels(self, channel_ids: List[str]) -> Dict[str, datetime]:
+        """Return last sync time for configured channels already in the database"""
+        synced = {}
+        for batch in chunked(channel_ids):
+            result = self.supabase.table('channels').select('channel_id, last_synced_at').in_('channel_id', batch).execute()
+            for row in result.data:
+                try:
+                    synced_at = datetime.fromisoformat(row['last_synced_at'])
+                except (TypeError, ValueError):
+                    continue
+                if synced_at.tzinfo is None:
+                    synced_at = synced_at.replace(tzinfo=timezone.utc)
+                synced[row['channel_id']] = synced_at
+        return synced
+    
+    def fetch_channel_metadata(self, channel_id: str) -> Optional[Dict]:
+        """Extract channel metadata and build its database row"""
+        channel_url = f'https://www.youtube.com/channel/{channel_id}'
+        
+        try:
+            # Get channel info
+            with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
+                info = ydl.extract_info(channel_url, download=False, process=False)
+                channel_name = info.get('uploader', channel_id)
+        except Exception as e:
+            logger.error(f'Error syncing channel {channel_id}: {e}')
+            return None
+        
+        logger.info(f'Synced channel: {channel_name} ({channel_id})')
+        return {
+            'channel_id': channel_id,
+            'channel_name': channel_name,
+            'channel_url': channel_url,
+            'is_active': True,
+            'last_synced_at': datetime.now(timezone.utc).isoformat()
+        }
     
     def sync_channels(self):
         """Sync channel list with database"""
-        for channel_id in self.channel_list:
-            if not channel_id.strip():
-                continue
-                
-            channel_url = f'https://www.youtube.com/channel/{channel_id}'
-            
+        channel_ids = list(dict.fromkeys(c.strip() for c in self.channel_list if c.strip()))
+        
+        # Only re-extract channels whose cached metadata is older than the TTL
+        cutoff = datetime.now(timezone.utc) - self.channel_sync_ttl
+        synced = self.get_synced_channels(channel_ids)
+        stale = [c for c in channel_ids if c not in synced or synced[c] < cutoff]
+        logger.info(f'Syncing {len(stale)} of {len(channel_ids)} channels (TTL {self.channel_sync_ttl})')
+        
+        if not stale:
+            return
+        
+        with ThreadPoolExecutor(max_workers=self.channel_concurrency) as executor:
+            rows = [row for row in executor.map(self.fetch_channel_metadata, stale) if row]
+        
+        # Upsert all refreshed channels in batched requests
+        for batch in chunked(rows):
             try:
-                # Get channel info
-                with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-                    info = ydl.extract_info(channel_url, download=False, process=False)
-                    channel_name = info.get('uploader', channel_id)
-                
-                # Upsert channel to database
-                self.supabase.table('channels').upsert({
-                    'channel_id': channel_id,
-                    'channel_name': channel_name,
-                    'channel_url': channel_url,
-                    'is_active': True
-                }, on_conflict='channel_id').execute()
-                
-                logger.info(f'Synced channel: {channel_name} ({channel_id})')
+                self.supabase.table('channels').upsert(batch, on_conflict='channel_id').execute()
             except Exception as e:
-                logger.error(f'Error syncing channel {channel_id}: {e}')
+                logger.error(f'Error upserting {len(batch)} channels: {e}')
+    
+    def iter_channel_entries(self, ydl: yt_dlp.YoutubeDL, channel_url: str) -> Iterator[Dict]:
+        """Yield channel entries newest first, lazily in flat discovery mode"""
+        if not self.flat_discovery:
+            info = ydl.extract_info(channel_url, download=False)
+            yield from (info or {}).get('entries') or []
+            return
+        
+        # process=False keeps entries as an unresolved generator of IDs/titles,
+        # so only the pages we actually iterate over are fetched
+        info = ydl.extract_info(channel_url, download=False, process=False)
+        while info and info.get('_type') in ('url', 'url_transparent'):
+            info = ydl.extract_info(info['url'], download=False, process=False)
+        
+        for entry in (info or {}).get('entries') or []:
+            if entry and entry.get('id'):
+                yield entry
+    
+    def _info_cache_path(self, video_id: str) -> Path:
+        return Path(self.info_cache_dir) / f'{video_id}.json'
+    
+    def load_cached_info(self, video_id: str) -> Optional[Dict]:
+        """Return cached extraction metadata for a video if it is within the TTL"""
+        path = self._info_cache_path(video_id)
+        try:
+            if time.time() - path.stat().st_mtime > self.info_cache_ttl:
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def save_cached_info(self, ydl: yt_dlp.YoutubeDL, info: Dict):
+        """Write extraction metadata to the on-disk cache atomically"""
+        path = self._info_cache_path(info['id'])
+        tmp_path = path.with_suffix('.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(ydl.sanitize_info(info), f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not cache metadata for {info['id']}: {e}")
+    
+    def evict_cached_info(self, video_id: str):
+        self._info_cache_path(video_id).unlink(missing_ok=True)
+    
+    def prune_info_cache(self):
+        """Remove cached metadata older than the TTL"""
+        cutoff = time.time() - self.info_cache_ttl
+        for path in Path(self.info_cache_dir).glob('*.json'):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                continue
+    
+    def resolve_entry(self, ydl: yt_dlp.YoutubeDL, entry: Dict, use_cache: bool = True) -> Optional[Dict]:
+        """Resolve full metadata for a discovered entry"""
+        if not self.flat_discovery and entry.get('formats'):
+            return entry
+        
+        if use_cache:
+            cached = self.load_cached_info(entry['id'])
+            if cached:
+                return cached
+        
+        info = ydl.extract_info(f"https://www.youtube.com/watch?v={entry['id']}", download=False)
+        if info:
+            self.save_cached_info(ydl, info)
+        return info
     
-    def download_channel_videos(self, channel_id: str):
-        """Download latest videos from a channel"""
-        channel_url = f'https://www.youtube.com/channel/{channel_id}/videos'
+    def download_resolved(self, ydl: yt_dlp.YoutubeDL, info: Dict) -> str:
+        """Download from an already-resolved info dict and return the artifact path"""
+        # process_ie_result skips extraction, so the video is not fetched twice
+        downloaded = ydl.process_ie_result(info, download=True)
+        if not downloaded:
+            raise RuntimeError('yt-dlp returned no result')
         
+        file_path = self.downloaded_file_path(ydl, downloaded)
+        if not os.path.exists(file_path):
+            raise RuntimeError(f'download produced no file at {file_path}')
+        return file_path
+    
+    def is_retryable(self, row: Dict) -> bool:
+        """Whether a videos row is a failed download still under the attempt limit"""
+        return row.get('download_status') == 'failed' and (row.get('download_attempts') or 0) < self.max_download_attempts
+    
+    def find_existing_video_ids(self, video_ids: List[str]) -> set:
+        """Return the subset of video IDs already processed, in one bulk query
+        
+        Failed downloads under the attempt limit are left out so they are retried.
+        """
+        with self._known_lock:
+            known = {v for v in video_ids if v in self._known_video_ids}
+        unknown = [v for v in video_ids if v not in known]
+        
+        if unknown:
+            result = self.supabase.table('videos').select('video_id, download_status, download_attempts').in_('video_id', unknown).execute()
+            found = set()
+            with self._known_lock:
+                for row in result.data:
+                    if self.is_retryable(row):
+                        self._retry_attempts[row['video_id']] = row.get('download_attempts') or 0
+                    else:
+                        found.add(row['video_id'])
+                self._known_video_ids.update(found)
+            known |= found
+        
+        return known
+    
+    def load_retryable_videos(self):
+        """Collect failed downloads under the attempt limit, grouped by channel
+        
+        They sit behind each channel's cursor, so discovery would never list them again.
+        """
+        retries = {}
+        rows = iter_rows(
+            'videos', 'id, video_id, channel_id, download_attempts',
+            filters=lambda query: query.eq('download_status', 'failed').lt('download_attempts', self.max_download_attempts)
+        )
+        with self._known_lock:
+            self._retry_attempts = {}
+            for row in rows:
+                self._retry_attempts[row['video_id']] = row.get('download_attempts') or 0
+                retries.setdefault(row['channel_id'], []).append({'id': row['video_id']})
+            self._retry_entries = retries
+        
+        if self._retry_attempts:
+            logger.info(f'Retrying {len(self._retry_attempts)} failed downloads')
+    
+    def pop_retry_entries(self, channel_db_id) -> List[Dict]:
+        """Take the failed downloads queued for retry on a channel"""
+        with self._known_lock:
+            return self._retry_entries.pop(channel_db_id, [])
+    
+    def mark_video_known(self, video_id: str):
+        """Record a newly inserted video in the run-level ID cache"""
+        with self._known_lock:
+            self._known_video_ids.add(video_id)
+    
+    def downloaded_file_path(self, ydl: yt_dlp.YoutubeDL, info: Dict) -> str:
+        """Return the path of the final artifact yt-dlp wrote for a video"""
+        downloads = info.get('requested_downloads') or []
+        if downloads and downloads[-1].get('filepath'):
+            return downloads[-1]['filepath']
+        return info.get('filepath') or ydl.prepare_filename(info)
+    
+    def update_channel_cursor(self, channel_id: str, newest_video_id: str):
+        """Store the newest seen video as the channel's high-water mark"""
+        # An update, not an upsert: it cannot trip NOT NULL columns or re-create a deleted channel
+        self.write_buffer.update('channels', {
+            'last_video_id': newest_video_id,
+            'last_check': FLUSH_TIME
+        }, 'channel_id', channel_id)
+    
+    def create_ydl(self) -> yt_dlp.YoutubeDL:
+        """Create a YoutubeDL instance; instances are not shared across threads"""
         def progress_hook(d):
             if d['status'] == 'finished':
                 logger.info(f"Downloaded: {d['filename']}")
         
-        self.ydl_opts['progress_hooks'] = [progress_hook]
+        return yt_dlp.YoutubeDL(dict(self.ydl_opts, progress_hooks=[progress_hook]))
+    
+    def discover_channel_videos(self, ydl: yt_dlp.YoutubeDL, channel: Dict):
+        """Return (new entries newest first, newest seen video ID) for a channel"""
+        channel_url = f"https://www.youtube.com/channel/{channel['channel_id']}/videos"
+        cursor = channel.get('last_video_id')
+        
+        # Get channel videos, stopping at the last video seen on a previous run
+        entries = itertools.takewhile(
+            lambda entry: entry['id'] != cursor,
+            self.iter_channel_entries(ydl, channel_url)
+        )
+        entries = list(itertools.islice(entries, self.max_videos))
+        new_entries = []
+        if entries:
+            # Check all candidates against the database at once
+            existing_ids = self.find_existing_video_ids([entry['id'] for entry in entries])
+            for video_id in existing_ids:
+                logger.info(f'Video {video_id} already processed, skipping')
+            new_entries = [entry for entry in entries if entry['id'] not in existing_ids]
+        
+        # Earlier failures queue behind the new uploads
+        seen = {entry['id'] for entry in new_entries}
+        new_entries += [entry for entry in self.pop_retry_entries(channel['id']) if entry['id'] not in seen]
+        
+        return new_entries, entries[0]['id'] if entries else None
+    
+    def download_video(self, ydl: yt_dlp.YoutubeDL, channel_db_id, entry: Dict) -> bool:
+        """Resolve, record and download a single new video"""
+        video_id = entry['id']
+        
+        # Only new videos pay for full metadata extraction
+        cached = self.load_cached_info(video_id)
+        entry = cached or self.resolve_entry(ydl, entry, use_cache=False)
+        if not entry:
+            logger.error(f'Could not resolve metadata for video {video_id}')
+            return False
+        
+        # Insert video metadata
+        video_data = {
+            'channel_id': channel_db_id,
+            'video_id': video_id,
+            'title': entry.get('title', ''),
+            'description': entry.get('description', ''),
+            'duration': entry.get('duration', 0),
+            'upload_date': datetime.strptime(entry.get('upload_date', ''), '%Y%m%d').date().isoformat() if entry.get('upload_date') else None,
+            'thumbnail_url': entry.get('thumbnail', ''),
+            'video_url': f"https://www.youtube.com/watch?v={video_id}",
+            'download_status': 'downloading'
+        }
+        
+        with self._known_lock:
+            attempts = self._retry_attempts.pop(video_id, None)
+        video_data['download_attempts'] = (attempts or 0) + 1
+        
+        # Synchronous write claims the video before the slow download starts
+        if attempts is None:
+            self.supabase.table('videos').insert(video_data).execute()
+        else:
+            logger.info(f"Retrying video {video_id} (attempt {video_data['download_attempts']} of {self.max_download_attempts})")
+            self.supabase.table('videos').upsert(video_data, on_conflict='video_id').execute()
+        self.mark_video_known(video_id)
         
+        # Download the video
         try:
-            with yt_dlp.YoutubeDL(self.ydl_opts) as ydl:
-                # Get channel videos
-                info = ydl.extract_info(channel_url, download=False)
-                
+            logger.info(f'Downloading: {entry["title"]}')
+            try:
+                file_path = self.download_resolved(ydl, entry)
+            except Exception as e:
+                if not cached:
+                    raise
+                # Stream URLs in cached metadata may have expired; re-extract once
+                logger.warning(f'Cached metadata for {video_id} failed ({e}), re-extracting')
+                self.evict_cached_info(video_id)
+                # A bare ID forces extraction; the cached dict carries the stale formats
+                entry = self.resolve_entry(ydl, {'id': video_id}, use_cache=False)
+                if not entry:
+                    raise
+                file_path = self.download_resolved(ydl, entry)
+            
+            # Update status; full rows let completions batch into one upsert
+            self.write_buffer.upsert('videos', dict(
+                video_data,
+                download_status='completed',
+                downloaded_at=datetime.now().isoformat(),
+                file_path=file_path
+            ), on_conflict='video_id')
+            self.evict_cached_info(video_id)
+            return True
+            
+        except Exception as e:
+            logger.error(f'Error downloading video {video_id}: {e}')
+            self.write_buffer.upsert('videos', dict(
+                video_data,
+                download_status='failed',
+                downloaded_at=None,
+                file_path=None
+            ), on_conflict='video_id')
+            return False
+    
+    def download_channel_videos(self, channel_id: str, channel: Optional[Dict] = None) -> Dict:
+        """Download latest videos from a single channel and return per-channel stats"""
+        stats = {'channel_id': channel_id, 'downloaded': 0, 'failed': 0, 'dropped': 0, 'error': None}
+        
+        try:
+            with self.create_ydl() as ydl:
                 # Get channel from database
-                channel_result = self.supabase.table('channels').select('*').eq('channel_id', channel_id).single().execute()
-                channel_db_id = channel_result.data['id']
+                if channel is None:
+                    channel = self.supabase.table('channels').select('*').eq('channel_id', channel_id).single().execute().data
                 
-                # Process only recent videos
-                videos_processed = 0
-                for entry in info['entries'][:self.max_videos]:
-                    if videos_processed >= self.max_videos:
-                        break
-                    
-                    video_id = entry['id']
-                    
-                    # Check if already in database
-                    existing = self.supabase.table('videos').select('id').eq('video_id', video_id).execute()
-                    if existing.data:
-                        logger.info(f'Video {video_id} already processed, skipping')
-                        continue
-                    
-                    # Insert video metadata
-                    video_data = {
-                        'channel_id': channel_db_id,
-                        'video_id': video_id,
-                        'title': entry.get('title', ''),
-                        'description': entry.get('description', ''),
-                        'duration': entry.get('duration', 0),
-                        'upload_date': datetime.strptime(entry.get('upload_date', ''), '%Y%m%d').date() if entry.get('upload_date') else None,
-                        'thumbnail_url': entry.get('thumbnail', ''),
-                        'video_url': f"https://www.youtube.com/watch?v={video_id}",
-                        'download_status': 'downloading'
-                    }
-                    
-                    video_record = self.supabase.table('videos').insert(video_data).execute()
-                    video_db_id = video_record.data[0]['id']
-                    
-                    # Download the video
-                    try:
-                        logger.info(f'Downloading: {entry["title"]}')
-                        ydl.download([f"https://www.youtube.com/watch?v={video_id}"])
-                        
-                        # Update status
-                        self.supabase.table('videos').update({
-                            'download_status': 'completed',
-                            'downloaded_at': datetime.now().isoformat(),
-                            'file_path': os.path.join(self.watched_folder, f"{entry.get('channel', 'unknown')}/{entry.get('upload_date', '')}_{entry.get('title', '')}.mp4")
-                        }).eq('id', video_db_id).execute()
-                        
-                        videos_processed += 1
-                        
-                    except Exception as e:
-                        logger.error(f'Error downloading video {video_id}: {e}')
-                        self.supabase.table('videos').update({
-                            'download_status': 'failed'
-                        }).eq('id', video_db_id).execute()
+                new_entries, newest_id = self.discover_channel_videos(ydl, channel)
+                for entry in new_entries:
+                    if self.download_video(ydl, channel['id'], entry):
+                        stats['downloaded'] += 1
+                    else:
+                        stats['failed'] += 1
                 
-                logger.info(f'Downloaded {videos_processed} videos from {channel_id}')
+                if newest_id:
+                    self.update_channel_cursor(channel['channel_id'], newest_id)
+                logger.info(f"Downloaded {stats['downloaded']} videos from {channel_id}")
                 
         except Exception as e:
             logger.error(f'Error processing channel {channel_id}: {e}')
+            stats['error'] = str(e)
+        
+        return stats
+    
+    def _claim_budget(self) -> bool:
+        """Reserve one download from the global per-run budget"""
+        with self._state_lock:
+            if self.run_budget and self._claimed >= self.run_budget:
+                return False
+            self._claimed += 1
+            return True
+    
+    def _discover_channel(self, channel: Dict, work_queue: queue.PriorityQueue):
+        """Discovery worker: enqueue a channel's new videos on the global queue"""
+        channel_id = channel['channel_id']
+        state = {
+            'channel_id': channel_id, 'channel_db_id': channel['id'],
+            'downloaded': 0, 'failed': 0, 'dropped': 0, 'error': None,
+            'pending': 0, 'newest_id': None
+        }
+        with self._state_lock:
+            self._channel_stats[channel_id] = state
+            if self.run_budget and self._claimed >= self.run_budget:
+                # Budget already spent; leave the cursor so the next run sees these videos
+                return
+        
+        logger.info(f"Discovering channel: {channel_id}")
+        try:
+            with self.create_ydl() as ydl:
+                new_entries, newest_id = self.discover_channel_videos(ydl, channel)
+            if not new_entries:
+                if newest_id:
+                    self.update_channel_cursor(channel['channel_id'], newest_id)
+                return
+        except Exception as e:
+            logger.error(f'Error processing channel {channel_id}: {e}')
+            state['error'] = str(e)
+            return
+        
+        with self._state_lock:
+            state['pending'] = len(new_entries)
+            state['newest_id'] = newest_id
+        
+        # Rank by position within the channel so every channel's newest
+        # video is downloaded before anyone's second video
+        for rank, entry in enumerate(new_entries):
+            work_queue.put((rank, next(self._sequence), {'state': state, 'entry': entry}))
+    
+    def _download_worker(self, work_queue: queue.PriorityQueue):
+        """Download worker: drain the global queue until a stop marker arrives"""
+        with self.create_ydl() as ydl:
+            while True:
+                _, _, item = work_queue.get()
+                if item is None:
+                    break
+                
+                state = item['state']
+                if not self._claim_budget():
+                    outcome = 'dropped'
+                else:
+                    try:
+                        outcome = 'downloaded' if self.download_video(ydl, state['channel_db_id'], item['entry']) else 'failed'
+                    except Exception as e:
+                        logger.error(f"Error downloading video {item['entry']['id']}: {e}")
+                        outcome = 'failed'
+                
+                with self._state_lock:
+                    state[outcome] += 1
+                    state['pending'] -= 1
+                    channel_done = state['pending'] == 0 and not state['dropped']
+                
+                # Only advance the cursor once every queued video was attempted
+                if channel_done and state['newest_id']:
+                    try:
+                        self.update_channel_cursor(state['channel_id'], state['newest_id'])
+                    except Exception as e:
+                        logger.error(f"Error updating cursor for {state['channel_id']}: {e}")
+    
+    def log_run_summary(self, results: List[Dict], elapsed: float):
+        """Log throughput and failures for a completed run"""
+        downloaded = sum(r['downloaded'] for r in results)
+        failed_videos = sum(r['failed'] for r in results)
+        dropped = sum(r['dropped'] for r in results)
+        failed_channels = [r['channel_id'] for r in results if r['error']]
+        minutes = max(elapsed, 1e-9) / 60
+        
+        logger.info(
+            f'Run summary: {len(results)} channels in {elapsed:.1f}s '
+            f'({len(results) / minutes:.1f} channels/min, {downloaded / minutes:.1f} videos/min), '
+            f'{downloaded} videos downloaded, {failed_videos} video failures, '
+            f'{dropped} deferred by run budget, {len(failed_channels)} channel failures '
+            f'(discovery={self.channel_concurrency}, download={self.download_workers})'
+        )
+        if failed_channels:
+            logger.warning(f'Failed channels: {", ".join(failed_channels)}')
     
     def run(self):
         """Main execution method"""
@@ -163,17 +554,49 @@ class YouTubeDownloader:
         
         # Sync channels
         self.sync_channels()
+        self.prune_info_cache()
+        self.load_retryable_videos()
+        
+        # Stream active channels page by page; a single select is capped by PostgREST
+        active_channels = iter_rows(
+            'channels', 'id, channel_id, last_video_id',
+            filters=lambda query: query.eq('is_active', True)
+        )
         
-        # Get active channels
-        active_channels = self.supabase.table('channels').select('channel_id').eq('is_active', True).execute()
+        # Discovery feeds one global queue that a pool of download workers drains
+        start_time = time.time()
+        self._channel_stats = {}
+        self._claimed = 0
+        work_queue = queue.PriorityQueue()
+        workers = [
+            threading.Thread(target=self._download_worker, args=(work_queue,), daemon=True)
+            for _ in range(self.download_workers)
+        ]
+        for worker in workers:
+            worker.start()
         
-        # Download videos from each channel
-        for channel in active_channels.data:
-            logger.info(f"Processing channel: {channel['channel_id']}")
-            self.download_channel_videos(channel['channel_id'])
+        try:
+            with ThreadPoolExecutor(max_workers=self.channel_concurrency) as executor:
+                for channel in active_channels:
+                    executor.submit(self._discover_channel, channel, work_queue)
+        finally:
+            # Stop the workers even if listing channels failed, or they block forever.
+            # Stop markers sort after every real item
+            for _ in workers:
+                work_queue.put((float('inf'), next(self._sequence), None))
+            for worker in workers:
+                worker.join()
+            
+            # Status and cursor writes are buffered; make sure they land before reporting
+            self.write_buffer.flush()
+            logger.info(f'Write buffer: {self.write_buffer.summary()}')
+            
+            results = list(self._channel_stats.values())
+            self.log_run_summary(results, time.time() - start_time)
         
         logger.info('Download process completed')
+        return results
 
 if __name__ == '__main__':
     downloader = YouTubeDownloader()
-    downloader.run()
\ No newline at end of file
+    downloader.run()